@@ -18,9 +18,10 @@
 """DNS TSIG support."""
 
 import base64
-import hashlib
 import hmac
+import platform
 import struct
+import sys
 
 import dns.exception
 import dns.name
@@ -73,6 +74,14 @@ class PeerBadTruncation(PeerError):
     """The peer didn't like amount of truncation in the TSIG we sent"""
 
 
+_peer_errors = {
+    dns.rcode.BADSIG: PeerBadSignature,
+    dns.rcode.BADKEY: PeerBadKey,
+    dns.rcode.BADTIME: PeerBadTime,
+    dns.rcode.BADTRUNC: PeerBadTruncation,
+}
+
+
 # TSIG Algorithms
 
 HMAC_MD5 = dns.name.from_text("HMAC-MD5.SIG-ALG.REG.INT")
@@ -88,6 +97,45 @@ GSS_TSIG = dns.name.from_text("gss-tsig")
 
 default_algorithm = HMAC_SHA256
 
+_recommended_algorithm = None
+
+
+def _have_sha2_extensions():
+    """Best-effort check for hardware SHA-2 acceleration (SHA-NI on x86,
+    the ARMv8 SHA2 extensions).  Returns None if we cannot tell."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_flags = f.read().split()
+    except OSError:
+        return None
+    machine = platform.machine().lower()
+    if machine in ("x86_64", "amd64"):
+        return "sha_ni" in cpu_flags
+    elif machine in ("aarch64", "arm64"):
+        return "sha2" in cpu_flags
+    return None
+
+
+def recommended_default_algorithm():
+    """Return the recommended TSIG algorithm for this host.
+
+    On a 64-bit CPU without hardware SHA-2 acceleration, SHA-512 is
+    faster in software than SHA-256, and HMAC-SHA512-256 produces a MAC
+    of the same size on the wire as HMAC-SHA256.  Both peers must agree
+    on the algorithm, so this is advisory only and the module default
+    remains HMAC-SHA256.
+
+    @rtype: dns.name.Name
+    """
+    global _recommended_algorithm
+    if _recommended_algorithm is None:
+        if _have_sha2_extensions() is False and sys.maxsize > 2**32:
+            _recommended_algorithm = HMAC_SHA512_256
+        else:
+            _recommended_algorithm = default_algorithm
+    return _recommended_algorithm
+
+
 mac_sizes = {
     HMAC_SHA1: 20,
     HMAC_SHA224: 28,
@@ -101,6 +149,15 @@ mac_sizes = {
     GSS_TSIG: 128,  # This is what we assume to be the worst case!
 }
 
+# Precompiled structs for the formats used on the TSIG hot paths, so the
+# format strings aren't reparsed on every sign or validate.
+_u16 = struct.Struct("!H")
+_u16_pair = struct.Struct("!HH")
+_time_and_fudge = struct.Struct("!HIH")
+
+# The class and TTL fields of the digested TSIG record are always ANY and 0.
+_class_and_ttl = struct.Struct("!HI").pack(dns.rdataclass.ANY, 0)
+
 
 class GSSTSig:
     """
@@ -114,20 +171,22 @@ class GSSTSig:
 
     def __init__(self, gssapi_context):
         self.gssapi_context = gssapi_context
-        self.data = b""
+        # A bytearray so update() is an amortized O(1) append rather than
+        # a full copy of all previously accumulated data.
+        self.data = bytearray()
         self.name = "gss-tsig"
 
     def update(self, data):
-        self.data += data
+        self.data.extend(data)
 
     def sign(self):
         # defer to the GSSAPI function to sign
-        return self.gssapi_context.get_signature(self.data)
+        return self.gssapi_context.get_signature(bytes(self.data))
 
     def verify(self, expected):
         try:
             # defer to the GSSAPI function to verify
-            return self.gssapi_context.verify_signature(self.data, expected)
+            return self.gssapi_context.verify_signature(bytes(self.data), expected)
         except Exception:
             # note the usage of a bare exception
             raise BadSignature
@@ -138,14 +197,15 @@ class GSSTSigAdapter:
         self.keyring = keyring
 
     def __call__(self, message, keyname):
-        if keyname in self.keyring:
-            key = self.keyring[keyname]
-            if isinstance(key, Key) and key.algorithm == GSS_TSIG:
-                if message:
-                    GSSTSigAdapter.parse_tkey_and_step(key, message, keyname)
-            return key
-        else:
+        key = self.keyring.get(keyname)
+        if key is None:
             return None
+        if isinstance(key, Key) and (
+            key.algorithm is GSS_TSIG or key.algorithm == GSS_TSIG
+        ):
+            if message:
+                GSSTSigAdapter.parse_tkey_and_step(key, message, keyname)
+        return key
 
     @classmethod
     def parse_tkey_and_step(cls, key, message, keyname):
@@ -171,34 +231,51 @@ class HMACTSig:
     sign/verify operations.
     """
 
+    # The algorithms are given as string names, as hmac uses its optimized
+    # OpenSSL-based implementation only when digestmod is a string.
     _hashes = {
-        HMAC_SHA1: hashlib.sha1,
-        HMAC_SHA224: hashlib.sha224,
-        HMAC_SHA256: hashlib.sha256,
-        HMAC_SHA256_128: (hashlib.sha256, 128),
-        HMAC_SHA384: hashlib.sha384,
-        HMAC_SHA384_192: (hashlib.sha384, 192),
-        HMAC_SHA512: hashlib.sha512,
-        HMAC_SHA512_256: (hashlib.sha512, 256),
-        HMAC_MD5: hashlib.md5,
+        HMAC_SHA1: "sha1",
+        HMAC_SHA224: "sha224",
+        HMAC_SHA256: "sha256",
+        HMAC_SHA256_128: ("sha256", 128),
+        HMAC_SHA384: "sha384",
+        HMAC_SHA384_192: ("sha384", 192),
+        HMAC_SHA512: "sha512",
+        HMAC_SHA512_256: ("sha512", 256),
+        HMAC_MD5: "md5",
     }
 
-    def __init__(self, key, algorithm):
-        try:
-            hashinfo = self._hashes[algorithm]
-        except KeyError:
-            raise NotImplementedError(f"TSIG algorithm {algorithm} is not supported")
+    # Callers normally pass one of the module-level algorithm constants,
+    # so try an identity-keyed probe first and fall back to hashing and
+    # comparing the name only for user-constructed Name objects.
+    _hashes_by_id = {id(algorithm): hashinfo for algorithm, hashinfo in _hashes.items()}
+
+    def __init__(self, key, algorithm, template=None):
+        hashinfo = self._hashes_by_id.get(id(algorithm))
+        if hashinfo is None:
+            try:
+                hashinfo = self._hashes[algorithm]
+            except KeyError:
+                raise NotImplementedError(
+                    f"TSIG algorithm {algorithm} is not supported"
+                )
 
-        # create the HMAC context
         if isinstance(hashinfo, tuple):
-            self.hmac_context = hmac.new(key, digestmod=hashinfo[0])
-            self.size = hashinfo[1]
+            (digestmod, self.size) = hashinfo
         else:
-            self.hmac_context = hmac.new(key, digestmod=hashinfo)
+            digestmod = hashinfo
             self.size = None
+        # create the HMAC context; copying a template clones the
+        # precomputed inner/outer pad state, which is cheaper than
+        # re-deriving it from the key.
+        if template is not None:
+            self.hmac_context = template.copy()
+        else:
+            self.hmac_context = hmac.new(key, digestmod=digestmod)
         self.name = self.hmac_context.name
         if self.size:
             self.name += f"-{self.size}"
+        self._mac_size = self.size // 8 if self.size else self.hmac_context.digest_size
 
     def update(self, data):
         return self.hmac_context.update(data)
@@ -207,11 +284,15 @@ class HMACTSig:
         # defer to the HMAC digest() function for that digestmod
         digest = self.hmac_context.digest()
         if self.size:
-            digest = digest[: (self.size // 8)]
+            digest = digest[: self._mac_size]
         return digest
 
     def verify(self, expected):
-        # re-digest and compare the results
+        # a MAC of the wrong length can never verify, so reject it before
+        # doing the work of computing our own digest
+        if len(expected) != self._mac_size:
+            raise BadSignature
+        # re-digest and compare the results in constant time
         mac = self.sign()
         if not hmac.compare_digest(mac, expected):
             raise BadSignature
@@ -228,25 +309,38 @@ def _digest(wire, key, rdata, time=None, request_mac=None, ctx=None, multi=None)
     if first:
         ctx = get_context(key)
         if request_mac:
-            ctx.update(struct.pack("!H", len(request_mac)))
-            ctx.update(request_mac)
-    ctx.update(struct.pack("!H", rdata.original_id))
-    ctx.update(wire[2:])
-    if first:
-        ctx.update(key.name.to_digestable())
-        ctx.update(struct.pack("!H", dns.rdataclass.ANY))
-        ctx.update(struct.pack("!I", 0))
+            ctx.update(_u16.pack(len(request_mac)) + request_mac)
+    ctx.update(_u16.pack(rdata.original_id))
+    if isinstance(wire, tuple):
+        # validate() passes the reconstructed message as a tuple of
+        # buffers (already excluding the original id) so it doesn't have
+        # to concatenate a new copy of the wire; HMAC doesn't care how
+        # the updates are chunked.
+        for part in wire:
+            ctx.update(part)
+    else:
+        # slice a memoryview so we hash a zero-copy view of the wire
+        # rather than a new bytes object
+        ctx.update(memoryview(wire)[2:])
     if time is None:
         time = rdata.time_signed
     upper_time = (time >> 32) & 0xFFFF
     lower_time = time & 0xFFFFFFFF
-    time_encoded = struct.pack("!HIH", upper_time, lower_time, rdata.fudge)
+    time_encoded = _time_and_fudge.pack(upper_time, lower_time, rdata.fudge)
     other_len = len(rdata.other)
     if other_len > 65535:
         raise ValueError("TSIG Other Data is > 65535 bytes")
     if first:
-        ctx.update(key.algorithm.to_digestable() + time_encoded)
-        ctx.update(struct.pack("!HH", rdata.error, other_len) + rdata.other)
+        # The remaining fields are all small, so concatenate them and make
+        # a single update() call rather than one per field.
+        ctx.update(
+            key._name_digestable
+            + _class_and_ttl
+            + key._algorithm_digestable
+            + time_encoded
+            + _u16_pair.pack(rdata.error, other_len)
+            + rdata.other
+        )
     else:
         ctx.update(time_encoded)
     return ctx
@@ -259,8 +353,7 @@ def _maybe_start_digest(key, mac, multi):
     """
     if multi:
         ctx = get_context(key)
-        ctx.update(struct.pack("!H", len(mac)))
-        ctx.update(mac)
+        ctx.update(_u16.pack(len(mac)) + mac)
         return ctx
     else:
         return None
@@ -282,6 +375,26 @@ def sign(wire, key, rdata, time=None, request_mac=None, ctx=None, multi=False):
     return (tsig, _maybe_start_digest(key, mac, multi))
 
 
+def sign_batch(wires_and_rdatas, key, time=None):
+    """Sign a batch of independent messages with the same key, amortizing
+    the per-message HMAC setup over the batch via the key's cached
+    context template.
+
+    I{wires_and_rdatas} is an iterable of (wire, rdata) tuples, one per
+    message to sign.
+
+    @rtype: list of TSIG rdatas with the MACs filled in
+    @raises ValueError: I{other_data} is too long
+    @raises NotImplementedError: I{algorithm} is not supported
+    """
+
+    tsigs = []
+    for wire, rdata in wires_and_rdatas:
+        (tsig, _) = sign(wire, key, rdata, time)
+        tsigs.append(tsig)
+    return tsigs
+
+
 def validate(
     wire, key, owner, rdata, now, request_mac, tsig_start, ctx=None, multi=False
 ):
@@ -293,22 +406,17 @@ def validate(
     @raises BadSignature: The TSIG signature did not validate
     @rtype: dns.tsig.HMACTSig or dns.tsig.GSSTSig object"""
 
-    (adcount,) = struct.unpack("!H", wire[10:12])
+    (adcount,) = _u16.unpack_from(wire, 10)
     if adcount == 0:
         raise dns.exception.FormError
     adcount -= 1
-    new_wire = wire[0:10] + struct.pack("!H", adcount) + wire[12:tsig_start]
+    mv = memoryview(wire)
+    new_wire = (mv[2:10], _u16.pack(adcount), mv[12:tsig_start])
     if rdata.error != 0:
-        if rdata.error == dns.rcode.BADSIG:
-            raise PeerBadSignature
-        elif rdata.error == dns.rcode.BADKEY:
-            raise PeerBadKey
-        elif rdata.error == dns.rcode.BADTIME:
-            raise PeerBadTime
-        elif rdata.error == dns.rcode.BADTRUNC:
-            raise PeerBadTruncation
-        else:
-            raise PeerError("unknown TSIG error code %d" % rdata.error)
+        exception = _peer_errors.get(rdata.error)
+        if exception is not None:
+            raise exception
+        raise PeerError("unknown TSIG error code %d" % rdata.error)
     if abs(rdata.time_signed - now) > rdata.fudge:
         raise BadTime
     if key.name != owner:
@@ -330,7 +438,13 @@ def get_context(key):
     if key.algorithm == GSS_TSIG:
         return GSSTSig(key.secret)
     else:
-        return HMACTSig(key.secret, key.algorithm)
+        ctx = HMACTSig(key.secret, key.algorithm, key._hmac_template)
+        if key._hmac_template is None:
+            # The template is never updated once stored, so copying it is
+            # safe; a concurrent first use at worst stores an equivalent
+            # template twice.
+            key._hmac_template = ctx.hmac_context.copy()
+        return ctx
 
 
 class Key:
@@ -344,6 +458,22 @@ class Key:
         if isinstance(algorithm, str):
             algorithm = dns.name.from_text(algorithm)
         self.algorithm = algorithm
+        # The digestable forms of the name and algorithm never change for
+        # a given key, so compute them once here instead of in every
+        # _digest() call.
+        self._name_digestable = self.name.to_digestable()
+        self._algorithm_digestable = self.algorithm.to_digestable()
+        # A keyed HMAC context to clone instead of re-deriving the pad
+        # state from the secret on every use; filled in lazily by
+        # get_context().
+        self._hmac_template = None
+
+    def __getstate__(self):
+        # Live HMAC objects cannot be pickled or copied, so drop the
+        # cached template; it is rebuilt lazily on next use.
+        state = self.__dict__.copy()
+        state["_hmac_template"] = None
+        return state
 
     def __eq__(self, other):
         return (
@@ -2,6 +2,8 @@
 
 import unittest
 from unittest.mock import Mock
+import copy
+import pickle
 import time
 import base64
 
@@ -198,6 +200,39 @@ class TSIGTestCase(unittest.TestCase):
         # not raising is passing
         dns.message.from_wire(w, keyring)
 
+    def test_key_is_copyable_after_use(self):
+        key = dns.tsig.Key("foo.com", "abcd", "hmac-sha256")
+        m = dns.message.make_query("example", "a")
+        m.use_tsig(key)
+        # signing fills in the key's cached HMAC template, which must not
+        # prevent pickling or copying the key afterwards
+        m.to_wire()
+        self.assertEqual(pickle.loads(pickle.dumps(key)), key)
+        self.assertEqual(copy.deepcopy(key), key)
+
+    def test_recommended_default_algorithm(self):
+        algorithm = dns.tsig.recommended_default_algorithm()
+        self.assertIn(algorithm, (dns.tsig.HMAC_SHA256, dns.tsig.HMAC_SHA512_256))
+        # the recommendation is cached, so we should get the same answer
+        self.assertEqual(dns.tsig.recommended_default_algorithm(), algorithm)
+
+    def test_sign_batch(self):
+        key = dns.tsig.Key("foo.com", "abcd", "hmac-sha256")
+        now = int(time.time())
+        wires_and_rdatas = []
+        for i in range(3):
+            m = dns.message.make_query(f"example{i}", "a")
+            wire = m.to_wire()
+            tsig = dns.message.Message._make_tsig(
+                key.name, key.algorithm, 0, 300, b"", m.id, 0, b""
+            )
+            wires_and_rdatas.append((wire, tsig[0]))
+        tsigs = dns.tsig.sign_batch(wires_and_rdatas, key, now)
+        self.assertEqual(len(tsigs), 3)
+        for (wire, rdata), tsig in zip(wires_and_rdatas, tsigs):
+            (expected, _) = dns.tsig.sign(wire, key, rdata, now)
+            self.assertEqual(tsig, expected)
+
     def test_sign_respond_and_validate(self):
         mq = dns.message.make_query("example", "a")
         mq.use_tsig(keyring, keyname)